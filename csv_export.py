@@ -1,7 +1,30 @@
+import csv
 import io
-import pandas as pd
 from flask import Response
-from inventory_api_main import app, error_response, query_all, query_one, ceil_two_decimals
+from inventory_api_main import (
+    app, error_response, flush_logs, iter_rows, query_one, ceil_two_decimals,
+)
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _csv_chunks(header, rows):
+    """Yield ``header`` and ``rows`` as encoded CSV in ~CHUNK_SIZE pieces.
+
+    One StringIO and csv.writer are reused for the whole response; rows are
+    accumulated until the buffer is large enough to be worth a socket write.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_SIZE:
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate(0)
+    yield buf.getvalue().encode()
 
 
 @app.route("/v1/export/<kind>", methods=["GET"])
@@ -10,22 +33,20 @@ def export_csv(kind: str):
         return error_response()
 
     if kind == "stocks":
-        rows = query_all("SELECT name, amount FROM stocks ORDER BY name")
-        df = pd.DataFrame(rows, columns=["name", "amount"])
+        rows = iter_rows("SELECT name, amount FROM stocks ORDER BY name")
+        body = _csv_chunks(("name", "amount"), rows)
     elif kind == "sales":
         total = query_one("SELECT total FROM sales WHERE id=1")[0]
-        df = pd.DataFrame([{"sales": ceil_two_decimals(total)}])
+        body = (b"sales\n", f"{ceil_two_decimals(total)}\n".encode())
     else:  # logs
-        rows = query_all(
+        flush_logs()
+        rows = iter_rows(
             "SELECT name, action, amount, timestamp FROM logs ORDER BY id DESC"
         )
-        df = pd.DataFrame(rows, columns=["name", "action", "amount", "timestamp"])
+        body = _csv_chunks(("name", "action", "amount", "timestamp"), rows)
 
-    buf = io.StringIO()
-    df.to_csv(buf, index=False)
-    csv_bytes = buf.getvalue().encode()
     return Response(
-        csv_bytes,
+        body,
         mimetype="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{kind}.csv"'},
     )
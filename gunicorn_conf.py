@@ -0,0 +1,33 @@
+"""Gunicorn settings for serving the inventory API in production.
+
+Run with: gunicorn -c gunicorn_conf.py csv_export:app
+(csv_export adds the /v1/export routes to inventory_api_main's app.)
+"""
+import os
+
+# BIND overrides; otherwise honour $PORT as set by Procfile-based platforms
+# (e.g. Elastic Beanstalk proxies from nginx on :80 to :8000)
+bind = os.environ.get("BIND") or f"0.0.0.0:{os.environ.get('PORT', '80')}"
+worker_class = "gthread"
+workers = 2 * (os.cpu_count() or 1) + 1
+threads = 4
+# import the app once in the master and share it copy-on-write with workers;
+# the SQLite connection is opened lazily, so each worker gets its own
+preload_app = True
+
+
+def on_starting(server):
+    from inventory_api_main import close_db, init_db
+
+    init_db()
+    close_db()  # no SQLite handle may be inherited across fork()
+
+
+def post_worker_init(worker):
+    # only trust X-Forwarded-* here, where the server sits behind a proxy;
+    # the development server started by app.run() stays without it
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    from inventory_api_main import app
+
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
@@ -12,27 +12,86 @@ return {"message": "ERROR"} with HTTP 400.
 """
 from __future__ import annotations
 
-import re
+import atexit
+import os
+import queue
 import sqlite3
-from contextlib import closing
+import threading
+import time
+from contextlib import contextmanager
 from decimal import Decimal, ROUND_UP
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterator, Tuple
 
-from flask import Flask, jsonify, request, url_for
+import orjson
+from flask import Flask, Response, request
 
 app = Flask(__name__)
 DB_PATH = Path("inventory.db")
-NAME_PATTERN = re.compile(r"^[A-Za-z]{1,8}$")  # 1–8 alphabetic chars (ASCII)
+_CENT = Decimal("0.01")
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+# One long-lived connection per process, shared by all its requests and
+# opened on first use (see _locked()), so importing this module - e.g. in a
+# preloading gunicorn master - touches no database. Access is serialised by
+# ``_db_lock`` so a transaction is never interleaved with another thread's.
+_conn: sqlite3.Connection | None = None
+_conn_pid: int | None = None
+_inherited_conns: list[sqlite3.Connection] = []
+_db_lock = threading.Lock()
+
+# Log rows are written off the request path by a daemon thread started on
+# the first log_event(); see _log_worker().
+INSERT_LOG_SQL = "INSERT INTO logs (name, action, amount) VALUES (?, ?, ?)"
+LOG_BATCH_SIZE = 256
+LOG_WRITE_ATTEMPTS = 5
+_log_q: queue.Queue[Tuple[str, str, int]] = queue.Queue()
+_log_thread: threading.Thread | None = None
+_log_start_lock = threading.Lock()
 
 ###############################################################################
 # DB helpers                                                                  #
 ###############################################################################
 
 
+@contextmanager
+def _locked() -> Iterator[sqlite3.Connection]:
+    """Hold ``_db_lock`` and yield this process's connection."""
+    global _conn, _conn_pid
+    with _db_lock:
+        if _conn_pid != os.getpid():
+            if _conn is not None:
+                # Opened before fork(). Closing it would release this
+                # process's POSIX locks on the file, including those of the
+                # new connection, so it is kept referenced and never used.
+                _inherited_conns.append(_conn)
+            _conn = _connect()
+            _conn_pid = os.getpid()
+        yield _conn
+
+
+def close_db() -> None:
+    """Close this process's connection; a gunicorn master does so before forking."""
+    global _conn, _conn_pid
+    with _db_lock:
+        if _conn is not None and _conn_pid == os.getpid():
+            _conn.close()
+            _conn = _conn_pid = None
+
+
 def init_db() -> None:
     """Create tables on first run and ensure a single sales row exists."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with _locked() as conn:
         cursor = conn.cursor()
         cursor.execute(
             """CREATE TABLE IF NOT EXISTS stocks (
@@ -55,33 +114,124 @@ def init_db() -> None:
                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP
                )"""
         )
+        # serves GET /v1/stocks from the index alone: no table scan, no sort
+        cursor.execute(
+            """CREATE INDEX IF NOT EXISTS idx_stocks_positive
+                   ON stocks(name, amount) WHERE amount > 0"""
+        )
         cursor.execute("INSERT OR IGNORE INTO sales (id, total) VALUES (1, 0)")
         conn.commit()
 
 
 def log_event(name: str, action: str, amount: int) -> None:
-    exec_sql(
-        "INSERT INTO logs (name, action, amount) VALUES (?, ?, ?)",
-        (name, action, amount),
-    )
+    """Queue a log row; it is inserted asynchronously by the log writer."""
+    if _log_thread is None:
+        _start_log_writer()
+    _log_q.put((name, action, amount))
+
+
+def flush_logs() -> None:
+    """Block until every queued log row has been written."""
+    if _log_thread is not None:
+        _log_q.join()
+
+
+def _start_log_writer() -> None:
+    global _log_thread
+    with _log_start_lock:
+        if _log_thread is None:
+            thread = threading.Thread(target=_log_worker, name="log-writer", daemon=True)
+            thread.start()
+            _log_thread = thread
+
+
+def _log_worker() -> None:
+    while True:
+        rows = [_log_q.get()]
+        try:
+            while len(rows) < LOG_BATCH_SIZE:
+                rows.append(_log_q.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            _write_log_rows(rows)
+        finally:
+            for _ in rows:
+                _log_q.task_done()
+
+
+def _write_log_rows(rows: list[Tuple[str, str, int]]) -> None:
+    for attempt in range(1, LOG_WRITE_ATTEMPTS + 1):
+        try:
+            # one prepared statement, bound once per row, one commit per batch
+            with _locked() as conn, conn:
+                conn.executemany(INSERT_LOG_SQL, rows)
+            return
+        except sqlite3.OperationalError as exc:
+            # e.g. "database is locked" while another worker holds the write lock
+            error: sqlite3.Error = exc
+            if attempt < LOG_WRITE_ATTEMPTS:
+                time.sleep(0.1 * attempt)
+        except sqlite3.Error as exc:
+            error = exc
+            break
+    # keep the rows in the application log so they can be recovered by hand
+    app.logger.error("failed to write %d log rows: %r", len(rows), rows, exc_info=error)
+
+
+def _after_fork_in_child() -> None:
+    """Reset per-process state in a forked child (e.g. a gunicorn worker).
+
+    Locks may have been held by another thread at fork() time and the log
+    writer thread does not survive it; the next log_event() starts a new
+    one. The connection is replaced by _locked(), which notices the new pid.
+    """
+    global _db_lock, _log_q, _log_thread, _log_start_lock
+    _db_lock = threading.Lock()
+    _log_q = queue.Queue()
+    _log_thread = None
+    _log_start_lock = threading.Lock()
+
+
+atexit.register(flush_logs)
+os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def exec_sql(sql: str, params: Tuple | Dict[str, Any] = ()) -> None:
-    with sqlite3.connect(DB_PATH) as conn:
+    with _locked() as conn, conn:
         conn.execute(sql, params)
-        conn.commit()
 
 
 def query_one(sql: str, params: Tuple | Dict[str, Any] = ()) -> Any:
-    with sqlite3.connect(DB_PATH) as conn, closing(conn.cursor()) as cur:
-        cur.execute(sql, params)
-        return cur.fetchone()
+    with _locked() as conn:
+        return conn.execute(sql, params).fetchone()
 
 
 def query_all(sql: str, params: Tuple | Dict[str, Any] = ()) -> list[Tuple[Any, ...]]:
-    with sqlite3.connect(DB_PATH) as conn, closing(conn.cursor()) as cur:
-        cur.execute(sql, params)
-        return cur.fetchall()
+    with _locked() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def iter_rows(
+    sql: str, params: Tuple | Dict[str, Any] = (), batch: int = 500
+) -> Iterator[Tuple[Any, ...]]:
+    """Yield result rows lazily, fetching ``batch`` rows at a time.
+
+    Runs on its own short-lived read-only connection: an open cursor pins
+    its connection to a WAL snapshot, which must not be the shared one.
+    """
+    conn = sqlite3.connect(
+        f"{DB_PATH.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+    )
+    try:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        conn.close()
 
 
 ###############################################################################
@@ -90,7 +240,8 @@ def query_all(sql: str, params: Tuple | Dict[str, Any] = ()) -> list[Tuple[Any,
 
 
 def validate_name(name: Any) -> str | None:
-    if isinstance(name, str) and NAME_PATTERN.fullmatch(name):
+    # 1–8 alphabetic chars (ASCII)
+    if isinstance(name, str) and 1 <= len(name) <= 8 and name.isascii() and name.isalpha():
         return name
     return None
 
@@ -109,14 +260,33 @@ def validate_positive_number(value: Any) -> float | None:
     return None
 
 
+def json_response(
+    obj: Any, status: int = 200, headers: Dict[str, str] | None = None
+) -> Response:
+    """Serialise ``obj`` with orjson, skipping Flask's JSON provider."""
+    return Response(
+        orjson.dumps(obj), status=status, headers=headers, mimetype="application/json"
+    )
+
+
+def json_body() -> Dict[str, Any]:
+    """Parse the request body with orjson; anything but a JSON object is ``{}``."""
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
 def error_response():
-    return jsonify({"message": "ERROR"}), 400
+    return json_response({"message": "ERROR"}, 400)
 
 
 def ceil_two_decimals(x: float) -> float:
-    return float(
-        Decimal(str(x)).quantize(Decimal("0.01"), rounding=ROUND_UP)
-    )
+    # totals built from prices in cents already have at most two decimals
+    if x == round(x, 2):
+        return float(x)
+    return float(Decimal(repr(x)).quantize(_CENT, rounding=ROUND_UP))
 
 
 ###############################################################################
@@ -126,25 +296,23 @@ def ceil_two_decimals(x: float) -> float:
 
 @app.route("/v1/stocks", methods=["POST"])
 def add_stock():
-    data = request.get_json(silent=True) or {}
+    data = json_body()
     name = validate_name(data.get("name"))
     amount = validate_positive_int(data.get("amount"), default=1)
     if name is None or amount is None:
         return error_response()
 
     # upsert to stocks table
-    existing = query_one("SELECT amount FROM stocks WHERE name = ?", (name,))
-    if existing:
-        exec_sql(
-            "UPDATE stocks SET amount = amount + ? WHERE name = ?", (amount, name)
-        )
-    else:
-        exec_sql("INSERT INTO stocks (name, amount) VALUES (?, ?)", (name, amount))
+    exec_sql(
+        "INSERT INTO stocks (name, amount) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET amount = amount + excluded.amount",
+        (name, amount),
+    )
 
     log_event(name, "add", amount)
 
-    location = url_for("get_stock", name=name, _external=True)
-    return jsonify({"name": name, "amount": amount}), 200, {"Location": location}
+    location = f"/v1/stocks/{name}"
+    return json_response({"name": name, "amount": amount}, headers={"Location": location})
 
 
 @app.route("/v1/stocks", methods=["GET"])
@@ -156,18 +324,18 @@ def get_stock(name: str | None = None):
             return error_response()
         row = query_one("SELECT amount FROM stocks WHERE name = ?", (valid_name,))
         amount = row[0] if row else 0
-        return jsonify({valid_name: amount})
+        return json_response({valid_name: amount})
 
     # no name: list all with amount > 0 sorted by name
     rows = query_all(
         "SELECT name, amount FROM stocks WHERE amount > 0 ORDER BY name ASC"
     )
-    return jsonify({r[0]: r[1] for r in rows})
+    return json_response(dict(rows))
 
 
 @app.route("/v1/sales", methods=["POST"])
 def create_sale():
-    data = request.get_json(silent=True) or {}
+    data = json_body()
     name = validate_name(data.get("name"))
     amount = validate_positive_int(data.get("amount"), default=1)
     price = (
@@ -176,37 +344,48 @@ def create_sale():
     if name is None or amount is None:
         return error_response()
 
-    # check stock availability
-    row = query_one("SELECT amount FROM stocks WHERE name = ?", (name,))
-    current = row[0] if row else 0
-    if current < amount:
-        return error_response()  # cannot oversell
-
-    exec_sql("UPDATE stocks SET amount = amount - ? WHERE name = ?", (amount, name))
+    # decrement stock and record turnover in one transaction
+    with _locked() as conn, conn:
+        cur = conn.execute(
+            "UPDATE stocks SET amount = amount - ? WHERE name = ? AND amount >= ?",
+            (amount, name, amount),
+        )
+        if cur.rowcount == 0:
+            return error_response()  # unknown product or cannot oversell
 
-    # update sales total if price provided
-    if price is not None:
-        increment = price * amount
-        exec_sql("UPDATE sales SET total = total + ? WHERE id = 1", (increment,))
+        # update sales total if price provided
+        if price is not None:
+            increment = price * amount
+            conn.execute(
+                "UPDATE sales SET total = total + ? WHERE id = 1", (increment,)
+            )
 
     log_event(name, "sale", amount)
 
-    location = url_for("create_sale", name=name, _external=True)
-    return jsonify({"name": name, "amount": amount}), 200, {"Location": location}
+    location = f"/v1/sales?name={name}"
+    return json_response({"name": name, "amount": amount}, headers={"Location": location})
 
 
 @app.route("/v1/sales", methods=["GET"])
 def get_sales():
     row = query_one("SELECT total FROM sales WHERE id = 1")
-    total = row[0] if row else 0.0
-    return jsonify({"sales": ceil_two_decimals(total)})
+    sales = ceil_two_decimals(row[0] if row else 0.0)
+
+    # the tag is derived from the value itself so it agrees across workers
+    etag = repr(sales)
+    headers = {"ETag": f'W/"{etag}"'}
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    return json_response({"sales": sales}, headers=headers)
 
 
 @app.route("/v1/stocks", methods=["DELETE"])
 def reset():
-    exec_sql("DELETE FROM stocks")
-    exec_sql("UPDATE sales SET total = 0 WHERE id = 1")
-    exec_sql("DELETE FROM logs")
+    flush_logs()  # so no earlier event lands after the wipe
+    with _locked() as conn, conn:
+        conn.execute("DELETE FROM stocks")
+        conn.execute("UPDATE sales SET total = 0 WHERE id = 1")
+        conn.execute("DELETE FROM logs")
     return "", 204  # No Content
 
 
@@ -215,5 +394,6 @@ def reset():
 ###############################################################################
 
 if __name__ == "__main__":
+    # development fallback; production runs gunicorn -c gunicorn_conf.py
     init_db()
     app.run(host="0.0.0.0", port=80)
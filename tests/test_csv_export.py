@@ -0,0 +1,147 @@
+import sys
+import os
+# Add project root to sys.path, so pytest can import csv_export
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import sqlite3
+import subprocess
+
+import pytest
+import csv_export  # noqa: F401  (registers the /v1/export routes)
+from inventory_api_main import DB_PATH, app, exec_sql, init_db
+
+@pytest.fixture(autouse=True)
+def client():
+    # Initialize database schema and ensure clean state before each test
+    init_db()
+    with app.test_client() as client:
+        client.delete("/v1/stocks")  # resets stocks, sales, and logs
+        yield client
+
+TS = rb"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}"
+
+# --- Tests for /v1/export endpoints ---
+
+def test_export_stocks(client):
+    client.post("/v1/stocks", json={"name": "bbb", "amount": 2})
+    client.post("/v1/stocks", json={"name": "aaa", "amount": 5})
+
+    resp = client.get("/v1/export/stocks")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/csv"
+    assert resp.headers["Content-Disposition"] == 'attachment; filename="stocks.csv"'
+    assert resp.data == b"name,amount\naaa,5\nbbb,2\n"
+
+
+def test_export_sales(client):
+    client.post("/v1/stocks", json={"name": "xxx", "amount": 10})
+    client.post("/v1/sales", json={"name": "xxx", "amount": 3, "price": 2.5})
+
+    resp = client.get("/v1/export/sales")
+    assert resp.data == b"sales\n7.5\n"
+
+
+def test_export_logs(client):
+    client.post("/v1/stocks", json={"name": "xxx", "amount": 10})
+    client.post("/v1/sales", json={"name": "xxx", "amount": 3})
+
+    # Newest first; queued events are flushed before exporting
+    resp = client.get("/v1/export/logs")
+    assert re.fullmatch(
+        rb"name,action,amount,timestamp\nxxx,sale,3," + TS + rb"\nxxx,add,10," + TS + rb"\n",
+        resp.data,
+    )
+
+
+def test_export_logs_quoting(client):
+    # logs.name is free text, so the export must quote it like any CSV writer
+    exec_sql("INSERT INTO logs (name, action, amount) VALUES (?, 'add', 1)", ('a,"b',))
+
+    resp = client.get("/v1/export/logs")
+    assert re.fullmatch(
+        rb'name,action,amount,timestamp\n"a,""b",add,1,' + TS + rb"\n", resp.data
+    )
+
+
+def test_export_large_is_chunked(client):
+    # Well over CHUNK_SIZE bytes of log rows
+    with sqlite3.connect(DB_PATH) as other:
+        other.executemany(
+            "INSERT INTO logs (name, action, amount, timestamp) VALUES (?, 'add', ?, ?)",
+            [("item", i, "2025-01-01 00:00:00") for i in range(5000)],
+        )
+
+    resp = client.get("/v1/export/logs", buffered=False)
+    chunks = list(resp.response)
+    resp.close()
+    assert len(chunks) > 1
+    assert all(len(c) >= csv_export.CHUNK_SIZE for c in chunks[:-1])
+
+    expected = b"name,action,amount,timestamp\n" + b"".join(
+        b"item,add,%d,2025-01-01 00:00:00\n" % i for i in reversed(range(5000))
+    )
+    assert b"".join(chunks) == expected
+
+
+def test_export_unknown_kind(client):
+    resp = client.get("/v1/export/nope")
+    assert resp.status_code == 400
+    assert resp.get_json() == {"message": "ERROR"}
+
+# --- Streaming behaviour ---
+
+def test_export_stream_does_not_pin_shared_connection(client, monkeypatch):
+    # Yield after every row so the export is still open mid-way, with more
+    # rows than one fetch batch so its read transaction stays open
+    monkeypatch.setattr(csv_export, "CHUNK_SIZE", 1)
+    names = ["a" + "".join(chr(97 + int(d)) for d in f"{i:03d}") for i in range(1000)]
+    with sqlite3.connect(DB_PATH) as other:
+        other.executemany(
+            "INSERT INTO stocks (name, amount) VALUES (?, 1)", [(n,) for n in names]
+        )
+
+    resp = client.get("/v1/export/stocks", buffered=False)
+    chunks = iter(resp.response)
+    assert next(chunks) == b"name,amount\naaaa,1\n"
+
+    # Another worker commits while the download is in progress
+    with sqlite3.connect(DB_PATH) as other:
+        other.execute("UPDATE stocks SET amount = 7 WHERE name = 'ajjj'")
+
+    # This worker sees the new data and can still write
+    assert client.get("/v1/stocks/ajjj").get_json() == {"ajjj": 7}
+    resp_sale = client.post("/v1/sales", json={"name": "ajjj", "amount": 2})
+    assert resp_sale.status_code == 200
+
+    # The export itself reads one consistent snapshot
+    rest = b"".join(chunks)
+    resp.close()
+    assert rest.endswith(b"ajjj,1\n")
+    assert rest.count(b"\n") == 999
+
+
+# --- Production entrypoint ---
+
+def test_procfile_app_serves_exports(tmp_path):
+    # Load the app in a fresh interpreter exactly as the Procfile names it, so
+    # routes registered by this test module's imports cannot mask a gap
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    with open(os.path.join(root, "Procfile")) as f:
+        target = f.read().split()[-1]
+    module, attr = target.split(":")
+    script = (
+        "import importlib, inventory_api_main\n"
+        "inventory_api_main.init_db()\n"
+        f"app = getattr(importlib.import_module({module!r}), {attr!r})\n"
+        "print(app.test_client().get('/v1/export/stocks').status_code)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": root},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "200"
@@ -4,7 +4,7 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
-from inventory_api_main import app, init_db
+from inventory_api_main import app, flush_logs, init_db, query_all
 
 @pytest.fixture(autouse=True)
 def client():
@@ -23,6 +23,7 @@ def test_add_and_get_stock(client):
     assert resp.status_code == 200
     data = resp.get_json()
     assert data == {"name": "aaa", "amount": 5}
+    assert resp.headers["Location"] == "/v1/stocks/aaa"
 
     # Retrieve single stock
     resp = client.get("/v1/stocks/aaa")
@@ -42,6 +43,17 @@ def test_get_all_stocks(client):
     assert resp.get_json() == {"bbb": 1, "ccc": 2}
 
 
+def test_add_stock_accumulates(client):
+    # Adding to an existing product increases its amount
+    client.post("/v1/stocks", json={"name": "ddd", "amount": 2})
+    resp = client.post("/v1/stocks", json={"name": "ddd", "amount": 3})
+    assert resp.status_code == 200
+    assert resp.get_json() == {"name": "ddd", "amount": 3}
+
+    resp = client.get("/v1/stocks/ddd")
+    assert resp.get_json() == {"ddd": 5}
+
+
 def test_add_stock_invalid(client):
     # Invalid name (too long)
     resp = client.post("/v1/stocks", json={"name": "toolongname", "amount": 1})
@@ -52,6 +64,12 @@ def test_add_stock_invalid(client):
     resp = client.post("/v1/stocks", json={"name": "aaa", "amount": -3})
     assert resp.status_code == 400
 
+    # Malformed or non-object body
+    resp = client.post("/v1/stocks", data="{", content_type="application/json")
+    assert resp.status_code == 400
+    resp = client.post("/v1/stocks", json=["aaa"])
+    assert resp.status_code == 400
+
 # --- Tests for /v1/sales endpoints ---
 
 def test_create_sale_and_get_sales(client):
@@ -91,6 +109,65 @@ def test_create_sale_invalid(client):
     resp = client.post("/v1/sales", json={"name": "zzz", "amount": 5})
     assert resp.status_code == 400
 
+    # Rejected sale leaves stock and sales untouched
+    assert client.get("/v1/stocks/zzz").get_json() == {"zzz": 1}
+    assert client.get("/v1/sales").get_json() == {"sales": 0.0}
+
+    # Unknown product
+    resp = client.post("/v1/sales", json={"name": "nope", "amount": 1, "price": 1})
+    assert resp.status_code == 400
+
+
+def test_create_sale_exact_stock(client):
+    # Selling the whole stock is allowed and hides the product from listings
+    client.post("/v1/stocks", json={"name": "vvv", "amount": 2})
+    resp = client.post("/v1/sales", json={"name": "vvv", "amount": 2})
+    assert resp.status_code == 200
+
+    assert client.get("/v1/stocks/vvv").get_json() == {"vvv": 0}
+    assert client.get("/v1/stocks").get_json() == {}
+
+
+def test_get_sales_etag(client):
+    client.post("/v1/stocks", json={"name": "www", "amount": 5})
+    client.post("/v1/sales", json={"name": "www", "amount": 1, "price": 2})
+
+    resp = client.get("/v1/sales")
+    etag = resp.headers["ETag"]
+    assert resp.get_json() == {"sales": 2.0}
+
+    # Unchanged total: client cache is still valid
+    resp = client.get("/v1/sales", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    # A new sale changes the total and therefore the tag
+    client.post("/v1/sales", json={"name": "www", "amount": 1, "price": 3})
+    resp = client.get("/v1/sales", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.get_json() == {"sales": 5.0}
+    assert resp.headers["ETag"] != etag
+
+# --- Tests for the event log ---
+
+def test_events_are_logged(client):
+    client.post("/v1/stocks", json={"name": "lll", "amount": 3})
+    client.post("/v1/sales", json={"name": "lll", "amount": 2, "price": 1})
+
+    # Rows are written by the background writer; wait for it
+    flush_logs()
+    rows = query_all("SELECT name, action, amount FROM logs ORDER BY id")
+    assert rows == [("lll", "add", 3), ("lll", "sale", 2)]
+
+
+def test_reset_clears_logs(client):
+    client.post("/v1/stocks", json={"name": "lll", "amount": 3})
+    client.post("/v1/sales", json={"name": "lll", "amount": 1})
+
+    # Reset waits for queued events, so none are written after the wipe
+    client.delete("/v1/stocks")
+    flush_logs()
+    assert query_all("SELECT * FROM logs") == []
+
 # --- Test reset endpoint ---
 
 def test_reset_clears_all(client):